@@ -0,0 +1,87 @@
+import argparse
+import time
+
+import main
+
+
+# Rollup buckets are already shifted to local time, so they are formatted
+# without applying another timezone offset.
+def format_hour(hour):
+    return time.strftime("%m-%d %H:00", time.gmtime(hour * 3600))
+
+
+def format_day(day):
+    return time.strftime("%Y-%m-%d", time.gmtime(day * 86400))
+
+
+def report(stats, title):
+    print(f"== {title} ==")
+    if not stats["spins"]:
+        print("No spins recorded.")
+        return
+
+    print(
+        f"spins {stats['spins']}  wins {stats['wins']} "
+        f"({100 * stats['wins'] / stats['spins']:.1f}%)  "
+        f"wagered ${stats['wagered']}  won ${stats['won']}  "
+        f"RTP {stats['won'] / stats['wagered'] if stats['wagered'] else 0:.3f}"
+    )
+
+    print("\nSpins per hour")
+    for offset, spins in enumerate(stats["spins_per_hour"]):
+        if spins:
+            print(f"  {format_hour(stats['first_hour'] + offset)}  {spins:>8}")
+
+    print("\nWin rate by bet")
+    for bet, spins, rate in zip(stats["bets"], stats["bet_spins"], stats["win_rate"]):
+        print(f"  ${bet:<6} {spins:>10} spins  {100 * rate:6.2f}%")
+
+    print("\nLose streak distribution")
+    for length, count in zip(stats["streak_lengths"], stats["streak_counts"]):
+        print(f"  {length:>4}  {count:>8}")
+
+    print("\nNet balance by day")
+    for i, day in enumerate(stats["days"]):
+        line = (
+            f"  {format_day(day)}  net {stats['net_by_day'][i]:>+10}"
+            f"  cumulative {stats['net_cumulative'][i]:>+10}"
+        )
+        if stats["closing_balance"] is not None:
+            line += f"  closing ${stats['closing_balance'][i]}"
+        print(line)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="EarnMashine session analytics.")
+    parser.add_argument("--db", default=main.DB_NAME)
+    parser.add_argument("--user", help="username; omit for the global view")
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--rebuild", action="store_true",
+                        help="recompute the rollup tables from spin_history first")
+    args = parser.parse_args()
+
+    main.DB_NAME = args.db
+    main.init_db()
+    conn = main.connect_db()
+
+    if args.rebuild:
+        start = time.perf_counter()
+        main.rebuild_rollups(conn)
+        print(f"Rebuilt rollups in {time.perf_counter() - start:.2f}s\n")
+
+    user_id = None
+    title = "All players"
+    if args.user:
+        row = conn.execute("SELECT id FROM users WHERE username=?", (args.user,)).fetchone()
+        if row is None:
+            parser.error(f"Unknown user: {args.user}")
+        user_id = row[0]
+        title = args.user
+
+    report(main.compute_analytics(conn, user_id, args.hours, args.days), title)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -2,30 +2,67 @@ import arcade
 import random
 import time
 import sys
+import os
+import io
+import math
+import wave
+import mmap
+import queue
+import struct
+import bisect
+import hashlib
+import logging
+import itertools
+import functools
+import threading
 import sqlite3
+import uuid
+from array import array
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from pyglet import media
+from PIL import Image, ImageDraw, ImageFont
 from PyQt6 import QtWidgets
 
 
+MUSIC_PATH = "music/music.mp3"
+
+log = logging.getLogger("earnmashine")
+
+
 class MusicManager:
-    def __init__(self, music_path):
-        self.music = arcade.load_sound(music_path)
+    def __init__(self, music=None):
+        self.music = music
         self.player = None
         self.enabled = True
+        self.wanted = False
         self.volume = 0.8
 
+    def set_music(self, music):
+        self.music = music
+        if self.wanted:
+            self.play()
+
     def play(self):
         if not self.enabled:
             return
 
-        if self.player is None:
-            self.player = arcade.play_sound(self.music, volume=self.volume)
-            if self.player:
-                self.player.loop = True
+        self.wanted = True
+        if self.player is None and self.music is not None:
+            self.player = media.Player()
+            self.player.volume = self.volume
+            self.player.loop = True
+            self.player.queue(self.music)
+            self.player.play()
+        METRICS.set_music_state(self.enabled, self.player is not None)
 
     def stop(self):
+        self.wanted = False
         if self.player:
             self.player.pause()
             self.player = None
+        METRICS.set_music_state(self.enabled, False)
 
     def toggle(self):
         self.enabled = not self.enabled
@@ -40,11 +77,292 @@ class MusicManager:
             self.stop()
             self.play()
 
+
+SFX_DIR = "sfx"
+SFX_VOICES = 8
+SFX_SAMPLE_RATE = 22050
+
+# Synthesized fallbacks used when sfx/<name>.wav is not shipped:
+# (frequency Hz, duration s) steps played back to back.
+SFX_DEFINITIONS = {
+    "click": [(1400, 0.025)],
+    "spin": [(330, 0.04), (440, 0.04), (550, 0.06)],
+    "reel_stop": [(160, 0.07)],
+    "win": [(523, 0.09), (659, 0.09), (784, 0.09), (1047, 0.22)],
+    "jackpot": [(523, 0.08), (784, 0.08), (1047, 0.08), (784, 0.08), (1047, 0.08), (1568, 0.35)],
+}
+
+
+def synthesize_effect(steps, sample_rate=SFX_SAMPLE_RATE):
+    samples = array("h")
+    fade = int(sample_rate * 0.005)
+    for frequency, duration in steps:
+        count = int(sample_rate * duration)
+        for i in range(count):
+            envelope = min(1.0, i / fade, (count - i) / fade)
+            value = math.sin(2 * math.pi * frequency * i / sample_rate)
+            samples.append(int(12000 * envelope * value))
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+    buffer.seek(0)
+    return buffer
+
+
+def load_effect(assets, name, steps):
+    path = os.path.join(SFX_DIR, name + ".wav")
+    if os.path.exists(path):
+        return media.load(path, streaming=False)
+    if assets is None:
+        return media.load(name + ".wav", file=synthesize_effect(steps), streaming=False)
+
+    key = assets.key(name, repr(steps), SFX_SAMPLE_RATE)
+    cache_path = assets.cache_path(key, ".wav")
+    if not os.path.exists(cache_path):
+        assets.write_cache(cache_path, synthesize_effect(steps).getvalue())
+    return assets.read_audio(cache_path)
+
+
+class SoundEffects:
+    # Effects are decoded into static sources once, and playback reuses a
+    # fixed set of players, so a trigger never decodes or allocates a player.
+    # With an asset manager the effects arrive from its workers instead;
+    # triggers for effects that are not ready yet are skipped.
+    def __init__(self, assets=None, voices=SFX_VOICES):
+        self.enabled = True
+        self.volume = 0.6
+        self.sounds = {}
+        self.voices = [media.Player() for _ in range(voices)]
+        self.voice_started = [0.0] * voices
+        for name, steps in SFX_DEFINITIONS.items():
+            if assets is None:
+                self.sounds[name] = load_effect(None, name, steps)
+            else:
+                assets.request("sfx:" + name, load_effect, (name, steps), priority=0)
+                assets.when_ready("sfx:" + name, functools.partial(self.sounds.__setitem__, name))
+
+    def free_voice(self):
+        for index, player in enumerate(self.voices):
+            if player.source is None:
+                return index
+        # All voices busy: steal the one that started longest ago.
+        return self.voice_started.index(min(self.voice_started))
+
+    def play(self, name):
+        if not self.enabled or name not in self.sounds:
+            return
+
+        index = self.free_voice()
+        player = self.voices[index]
+        if player.source is not None:
+            player.pause()
+            player.next_source()
+        player.volume = self.volume
+        player.queue(self.sounds[name])
+        player.play()
+        self.voice_started[index] = time.monotonic()
+
+    def toggle(self):
+        self.enabled = not self.enabled
+
+    def set_volume(self, volume):
+        self.volume = max(0.0, min(1.0, volume))
+
+
+ASSET_CACHE_DIR = ".asset_cache"
+ASSET_WORKERS = 2
+GLYPH_SIZE = 64
+
+# Color emoji fonts and the pixel sizes their bitmap strikes support.
+EMOJI_FONTS = [
+    ("/usr/share/fonts/truetype/noto/NotoColorEmoji.ttf", 109),
+    ("/usr/share/fonts/noto/NotoColorEmoji.ttf", 109),
+    ("/usr/share/fonts/google-noto-emoji/NotoColorEmoji.ttf", 109),
+    ("C:/Windows/Fonts/seguiemj.ttf", GLYPH_SIZE),
+    ("/System/Library/Fonts/Apple Color Emoji.ttc", GLYPH_SIZE),
+]
+
+SYMBOL_TEXTURES = {}
+
+
+class AssetManager:
+    # Loaders run on worker threads in priority order (lower first) and keep
+    # their decoded output in cache_dir under a hash of the source content.
+    # Finished assets are handed over in poll(), which the windows call from
+    # on_update, so callbacks always run on the main thread.
+    def __init__(self, cache_dir=ASSET_CACHE_DIR, workers=ASSET_WORKERS):
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.jobs = queue.PriorityQueue()
+        self.finished = deque()
+        self.order = itertools.count()
+        self.assets = {}
+        self.errors = {}
+        self.callbacks = defaultdict(list)
+        self.hashes = {}
+        self.total = 0
+        self.done = 0
+
+    def start(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for _ in range(self.workers):
+            threading.Thread(target=self.work, daemon=True).start()
+
+    def request(self, name, loader, args=(), priority=1):
+        self.total += 1
+        self.jobs.put((priority, next(self.order), name, loader, args))
+
+    def when_ready(self, name, callback):
+        if name in self.assets:
+            callback(self.assets[name])
+        else:
+            self.callbacks[name].append(callback)
+
+    def get(self, name):
+        return self.assets.get(name)
+
+    def loading(self):
+        return self.done < self.total
+
+    def work(self):
+        while True:
+            _, _, name, loader, args = self.jobs.get()
+            try:
+                self.finished.append((name, loader(self, *args), None))
+            except Exception as e:
+                self.finished.append((name, None, e))
+
+    def poll(self):
+        while self.finished:
+            name, asset, error = self.finished.popleft()
+            self.done += 1
+            if error is not None:
+                self.errors[name] = error
+                log.warning("Failed to load asset %s: %s", name, error)
+                continue
+            self.assets[name] = asset
+            for callback in self.callbacks.pop(name, []):
+                callback(asset)
+
+    def file_hash(self, path):
+        stat = os.stat(path)
+        marker = (path, stat.st_size, stat.st_mtime)
+        if self.hashes.get(path, (None,))[0] != marker:
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+            self.hashes[path] = (marker, digest.hexdigest())
+        return self.hashes[path][1]
+
+    def key(self, *parts):
+        return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+    def cache_path(self, key, extension):
+        return os.path.join(self.cache_dir, key + extension)
+
+    def write_cache(self, path, data):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def map_cache(self, path):
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read_audio(self, path):
+        mapped = self.map_cache(path)
+        try:
+            return media.load(path, file=mapped, streaming=False)
+        finally:
+            mapped.close()
+
+
+def load_audio(assets, path):
+    key = assets.key("pcm", assets.file_hash(path))
+    cache_path = assets.cache_path(key, ".wav")
+    if os.path.exists(cache_path):
+        return assets.read_audio(cache_path)
+
+    source = media.load(path, streaming=True)
+    audio_format = source.audio_format
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(audio_format.channels)
+        wav.setsampwidth(audio_format.sample_size // 8)
+        wav.setframerate(audio_format.sample_rate)
+        while True:
+            audio_data = source.get_audio_data(1 << 20)
+            if audio_data is None:
+                break
+            wav.writeframes(audio_data.data)
+    assets.write_cache(cache_path, buffer.getvalue())
+    return assets.read_audio(cache_path)
+
+
+def find_emoji_font():
+    for path, size in EMOJI_FONTS:
+        if os.path.exists(path):
+            return path, size
+    return None, None
+
+
+def load_glyph(assets, text, font_path, font_size):
+    key = assets.key("glyph", assets.file_hash(font_path), font_size, GLYPH_SIZE, text)
+    cache_path = assets.cache_path(key, ".rgba")
+    if os.path.exists(cache_path):
+        mapped = assets.map_cache(cache_path)
+        width, height = struct.unpack_from("<II", mapped)
+        return Image.frombuffer("RGBA", (width, height), memoryview(mapped)[8:], "raw", "RGBA", 0, 1)
+
+    font = ImageFont.truetype(font_path, font_size)
+    left, top, right, bottom = font.getbbox(text)
+    image = Image.new("RGBA", (right - left, bottom - top), (0, 0, 0, 0))
+    ImageDraw.Draw(image).text((-left, -top), text, font=font, embedded_color=True)
+    image.thumbnail((GLYPH_SIZE, GLYPH_SIZE), Image.LANCZOS)
+    assets.write_cache(cache_path, struct.pack("<II", *image.size) + image.tobytes())
+    return image
+
+
+def set_symbol_texture(emoji, image):
+    SYMBOL_TEXTURES[emoji] = arcade.Texture(image, hash="glyph:" + emoji)
+
+
+def start_asset_pipeline():
+    assets = AssetManager()
+    assets.start()
+    assets.request("music", load_audio, (MUSIC_PATH,), priority=1)
+
+    # Without a color emoji font the reels keep drawing the symbols as text.
+    font_path, font_size = find_emoji_font()
+    if font_path is None:
+        return assets
+    for symbol in SYMBOLS:
+        name = "glyph:" + symbol["emoji"]
+        assets.request(name, load_glyph, (symbol["emoji"], font_path, font_size), priority=2)
+        assets.when_ready(name, functools.partial(set_symbol_texture, symbol["emoji"]))
+    return assets
+
+
 DB_NAME = "users.db"
+DB_TIMEOUT = 5.0
+
+JACKPOT_SHARDS = 16
+JACKPOT_SEED = 500
+JACKPOT_CONTRIBUTION = 0.02
+
+
+def connect_db():
+    return sqlite3.connect(DB_NAME, timeout=DB_TIMEOUT)
 
 
 def init_db():
-    conn = sqlite3.connect(DB_NAME)
+    conn = connect_db()
     cursor = conn.cursor()
 
     cursor.execute("""
@@ -70,10 +388,500 @@ def init_db():
         )
     """)
 
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS jackpot_shards (
+            shard INTEGER PRIMARY KEY,
+            amount INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS jackpot_claims (
+            spin_id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            bet INTEGER NOT NULL,
+            played_at REAL NOT NULL,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS jackpot_payouts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            spin_id TEXT UNIQUE NOT NULL,
+            user_id INTEGER NOT NULL,
+            bet INTEGER NOT NULL,
+            played_at REAL NOT NULL,
+            amount INTEGER NOT NULL,
+            paid_at REAL NOT NULL,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS spin_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            played_at REAL NOT NULL,
+            bet INTEGER NOT NULL,
+            win INTEGER NOT NULL,
+            balance INTEGER NOT NULL,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_hourly (
+            user_id INTEGER NOT NULL,
+            hour INTEGER NOT NULL,
+            bet INTEGER NOT NULL,
+            spins INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            wagered INTEGER NOT NULL DEFAULT 0,
+            won INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY(user_id, hour, bet)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_daily (
+            user_id INTEGER NOT NULL,
+            day INTEGER NOT NULL,
+            spins INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            wagered INTEGER NOT NULL DEFAULT 0,
+            won INTEGER NOT NULL DEFAULT 0,
+            closing_balance INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY(user_id, day)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_bets (
+            user_id INTEGER NOT NULL,
+            bet INTEGER NOT NULL,
+            spins INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            wagered INTEGER NOT NULL DEFAULT 0,
+            won INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY(user_id, bet)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS lose_streaks (
+            user_id INTEGER NOT NULL,
+            length INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY(user_id, length)
+        )
+    """)
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS rollup_hourly_hour ON rollup_hourly(hour)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS rollup_daily_day ON rollup_daily(day)")
+
+    cursor.executemany(
+        "INSERT OR IGNORE INTO jackpot_shards (shard, amount) VALUES (?, ?)",
+        [(shard, JACKPOT_SEED if shard == 0 else 0) for shard in range(JACKPOT_SHARDS)]
+    )
+
     conn.commit()
     conn.close()
 
 
+def create_user(conn, username, password, balance):
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO users (username, password) VALUES (?, ?)",
+        (username, password)
+    )
+
+    user_id = cursor.lastrowid
+    cursor.execute(
+        "INSERT INTO progress (user_id, balance) VALUES (?, ?)",
+        (user_id, balance)
+    )
+
+    conn.commit()
+    return user_id
+
+
+def find_user(conn, username, password):
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT id FROM users WHERE username=? AND password=?",
+        (username, password)
+    )
+    result = cursor.fetchone()
+    return result[0] if result else None
+
+
+def fetch_progress(conn, user_id):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT balance, level, xp,
+               total_spins, total_wins,
+               total_win_amount, lose_streak,
+               (SELECT avatar FROM users WHERE id=?)
+        FROM progress WHERE user_id=?
+    """, (user_id, user_id))
+    return cursor.fetchone()
+
+
+def write_progress(conn, user_id, balance, level, xp,
+                   total_spins, total_wins, total_win_amount, lose_streak):
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE progress SET
+        balance=?, level=?, xp=?,
+        total_spins=?, total_wins=?,
+        total_win_amount=?, lose_streak=?
+        WHERE user_id=?
+    """, (
+        balance,
+        level,
+        xp,
+        total_spins,
+        total_wins,
+        total_win_amount,
+        lose_streak,
+        user_id
+    ))
+    conn.commit()
+
+
+def add_jackpot_contribution(conn, user_id, amount):
+    # Left uncommitted so it lands in the same transaction as the next
+    # write_progress call. The shard is picked by user_id, so players share
+    # shard rows; SQLite locks the whole file on write, so the shards do
+    # not reduce contention, they only spread the pool over several rows.
+    conn.execute(
+        "UPDATE jackpot_shards SET amount = amount + ? WHERE shard=?",
+        (amount, user_id % JACKPOT_SHARDS)
+    )
+
+
+def jackpot_total(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(SUM(amount), 0) FROM jackpot_shards")
+    return cursor.fetchone()[0]
+
+
+def add_jackpot_claims(conn, user_id, claims):
+    # Claims are committed before they are settled, so a winning spin is
+    # paid even if the game exits before the payout transaction succeeds.
+    # Each claim is a (spin_id, bet, played_at) tuple.
+    conn.executemany(
+        "INSERT OR IGNORE INTO jackpot_claims (spin_id, user_id, bet, played_at) "
+        "VALUES (?, ?, ?, ?)",
+        [(spin_id, user_id, bet, played_at) for spin_id, bet, played_at in claims]
+    )
+    conn.commit()
+
+
+def claim_jackpot(conn, spin_id, user_id):
+    # Pays the pool into progress and the rollups and removes the claim in
+    # one transaction. The payout row is keyed by spin_id, so a claim that
+    # was already paid is only cleaned up and pays nothing more.
+    if conn.in_transaction:
+        conn.commit()
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        cursor.execute(
+            "SELECT bet, played_at FROM jackpot_claims WHERE spin_id=? AND user_id=?",
+            (spin_id, user_id)
+        )
+        claim = cursor.fetchone()
+        if claim is None:
+            conn.commit()
+            return 0
+        bet, played_at = claim
+        cursor.execute("DELETE FROM jackpot_claims WHERE spin_id=?", (spin_id,))
+        cursor.execute("SELECT amount FROM jackpot_payouts WHERE spin_id=?", (spin_id,))
+        if cursor.fetchone():
+            conn.commit()
+            return 0
+
+        cursor.execute("SELECT COALESCE(SUM(amount), 0) FROM jackpot_shards")
+        amount = cursor.fetchone()[0]
+        cursor.execute(
+            "INSERT INTO jackpot_payouts (spin_id, user_id, bet, played_at, amount, paid_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (spin_id, user_id, bet, played_at, amount, time.time())
+        )
+        cursor.execute(
+            "UPDATE jackpot_shards SET amount = CASE WHEN shard=0 THEN ? ELSE 0 END",
+            (JACKPOT_SEED,)
+        )
+        cursor.execute(
+            "UPDATE progress SET balance = balance + ?, total_win_amount = total_win_amount + ? "
+            "WHERE user_id=?",
+            (amount, amount, user_id)
+        )
+        # The payout is booked against the winning spin's bet and hour; the
+        # spin itself is recorded as a zero-win spin by record_spin.
+        bump_rollups(cursor, user_id, played_at, bet, 0, 0, 0, amount)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return amount
+
+
+def settle_jackpot_claims(conn, user_id):
+    # Returns the amounts paid and whether every open claim was settled;
+    # a locked database leaves the rest of the claims for the next attempt.
+    paid = []
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT spin_id FROM jackpot_claims WHERE user_id=? ORDER BY played_at",
+            (user_id,)
+        )
+        for (spin_id,) in cursor.fetchall():
+            amount = claim_jackpot(conn, spin_id, user_id)
+            if amount:
+                paid.append(amount)
+    except sqlite3.OperationalError:
+        return paid, False
+    return paid, True
+
+
+def local_seconds(timestamp):
+    # Rollups are bucketed on local wall-clock time so days start at the
+    # player's midnight; SQLite's 'localtime' modifier matches this.
+    return timestamp + time.localtime(timestamp).tm_gmtoff
+
+
+def bump_rollups(cursor, user_id, played_at, bet, spins, wins, wagered, won, balance=None):
+    # balance=None leaves the day's closing balance alone; jackpot payouts
+    # only add to the amount won.
+    local = local_seconds(played_at)
+    hour = int(local // 3600)
+    day = int(local // 86400)
+    cursor.execute("""
+        INSERT INTO rollup_hourly (user_id, hour, bet, spins, wins, wagered, won)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, hour, bet) DO UPDATE SET
+        spins = spins + excluded.spins, wins = wins + excluded.wins,
+        wagered = wagered + excluded.wagered, won = won + excluded.won
+    """, (user_id, hour, bet, spins, wins, wagered, won))
+    cursor.execute("""
+        INSERT INTO rollup_bets (user_id, bet, spins, wins, wagered, won)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, bet) DO UPDATE SET
+        spins = spins + excluded.spins, wins = wins + excluded.wins,
+        wagered = wagered + excluded.wagered, won = won + excluded.won
+    """, (user_id, bet, spins, wins, wagered, won))
+    cursor.execute("""
+        INSERT INTO rollup_daily (user_id, day, spins, wins, wagered, won, closing_balance)
+        VALUES (?, ?, ?, ?, ?, ?, COALESCE(?, 0))
+        ON CONFLICT(user_id, day) DO UPDATE SET
+        spins = spins + excluded.spins, wins = wins + excluded.wins,
+        wagered = wagered + excluded.wagered, won = won + excluded.won,
+        closing_balance = COALESCE(?, closing_balance)
+    """, (user_id, day, spins, wins, wagered, won, balance, balance))
+
+
+def record_spin(conn, user_id, played_at, bet, win, balance, ended_streak=0):
+    # Like add_jackpot_contribution this is committed by the following
+    # write_progress. The rollups are bumped in the same transaction so the
+    # analytics views never have to rescan spin_history.
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO spin_history (user_id, played_at, bet, win, balance) VALUES (?, ?, ?, ?, ?)",
+        (user_id, played_at, bet, win, balance)
+    )
+    bump_rollups(cursor, user_id, played_at, bet, 1, 1 if win > 0 else 0, bet, win, balance)
+    if ended_streak:
+        cursor.execute("""
+            INSERT INTO lose_streaks (user_id, length, count) VALUES (?, ?, 1)
+            ON CONFLICT(user_id, length) DO UPDATE SET count = count + 1
+        """, (user_id, ended_streak))
+
+
+def save_spin(conn, user_id, progress, contribution=0, spin=None, claims=(), settle=False):
+    # The full write path of one save, shared with stress_db. New jackpot
+    # claims are committed and open ones settled first; the contribution,
+    # the spin and the progress row then go in a single transaction.
+    # progress is (balance, level, xp, total_spins, total_wins,
+    # total_win_amount, lose_streak) without the jackpots paid here.
+    # Returns (paid, settled, jackpot_total).
+    if claims:
+        add_jackpot_claims(conn, user_id, claims)
+    paid, settled = [], True
+    if claims or settle:
+        paid, settled = settle_jackpot_claims(conn, user_id)
+    balance, level, xp, total_spins, total_wins, total_win_amount, lose_streak = progress
+    balance += sum(paid)
+    total_win_amount += sum(paid)
+    if contribution:
+        add_jackpot_contribution(conn, user_id, contribution)
+    if spin:
+        record_spin(
+            conn,
+            user_id,
+            spin["played_at"],
+            spin["bet"],
+            spin["win"],
+            balance,
+            spin["ended_streak"]
+        )
+    write_progress(
+        conn, user_id, balance, level, xp, total_spins, total_wins, total_win_amount, lose_streak
+    )
+    return paid, settled, jackpot_total(conn)
+
+
+def load_player(conn, user_id):
+    # Claims left open by an earlier session are paid into progress before
+    # it is read. Returns (paid, settled, progress, jackpot_total).
+    paid, settled = settle_jackpot_claims(conn, user_id)
+    return paid, settled, fetch_progress(conn, user_id), jackpot_total(conn)
+
+
+def fetch_columns(conn, query, params=()):
+    cursor = conn.execute(query, params)
+    names = [column[0] for column in cursor.description]
+    rows = cursor.fetchall()
+    if not rows:
+        return {name: np.zeros(0, dtype=np.int64) for name in names}
+    data = np.array(rows, dtype=np.int64)
+    return {name: data[:, i] for i, name in enumerate(names)}
+
+
+def compute_analytics(conn, user_id=None, hours=24, days=30, now=None):
+    # user_id=None gives the global view across every player. Every query
+    # is bounded by the time window or by the number of distinct bets and
+    # streak lengths, so the cost does not grow with total history.
+    now = time.time() if now is None else now
+    user_filter = "AND user_id=?" if user_id is not None else ""
+    user_params = (user_id,) if user_id is not None else ()
+    local_now = local_seconds(now)
+    first_hour = int(local_now // 3600) - hours + 1
+    first_day = int(local_now // 86400) - days + 1
+
+    hourly = fetch_columns(
+        conn,
+        f"SELECT hour, SUM(spins) AS spins FROM rollup_hourly "
+        f"WHERE hour >= ? AND hour < ? {user_filter} GROUP BY hour",
+        (first_hour, first_hour + hours) + user_params
+    )
+    by_bet = fetch_columns(
+        conn,
+        f"SELECT bet, SUM(spins) AS spins, SUM(wins) AS wins, "
+        f"SUM(wagered) AS wagered, SUM(won) AS won "
+        f"FROM rollup_bets WHERE 1=1 {user_filter} GROUP BY bet ORDER BY bet",
+        user_params
+    )
+    daily = fetch_columns(
+        conn,
+        f"SELECT day, SUM(wagered) AS wagered, SUM(won) AS won, "
+        f"MAX(closing_balance) AS closing_balance "
+        f"FROM rollup_daily WHERE day >= ? {user_filter} GROUP BY day ORDER BY day",
+        (first_day,) + user_params
+    )
+    streaks = fetch_columns(
+        conn,
+        f"SELECT length, SUM(count) AS count FROM lose_streaks "
+        f"WHERE 1=1 {user_filter} GROUP BY length ORDER BY length",
+        user_params
+    )
+
+    spins_per_hour = np.zeros(hours, dtype=np.int64)
+    spins_per_hour[hourly["hour"] - first_hour] = hourly["spins"]
+
+    win_rate = np.divide(
+        by_bet["wins"], by_bet["spins"], out=np.zeros(len(by_bet["bet"])),
+        where=by_bet["spins"] > 0
+    )
+    net = daily["won"] - daily["wagered"]
+
+    return {
+        "spins": int(by_bet["spins"].sum()),
+        "wins": int(by_bet["wins"].sum()),
+        "wagered": int(by_bet["wagered"].sum()),
+        "won": int(by_bet["won"].sum()),
+        "first_hour": first_hour,
+        "spins_per_hour": spins_per_hour,
+        "bets": by_bet["bet"],
+        "bet_spins": by_bet["spins"],
+        "win_rate": win_rate,
+        "streak_lengths": streaks["length"],
+        "streak_counts": streaks["count"],
+        "days": daily["day"],
+        "net_by_day": net,
+        "net_cumulative": np.cumsum(net),
+        "closing_balance": daily["closing_balance"] if user_id is not None else None,
+    }
+
+
+def rebuild_rollups(conn):
+    # One-off full rescan, for databases that have spin_history but lost or
+    # predate the rollup tables. Normal play maintains them in record_spin.
+    history = fetch_columns(
+        conn, "SELECT user_id, win FROM spin_history ORDER BY user_id, id"
+    )
+    users = history["user_id"]
+    is_win = history["win"] > 0
+    losses = (~is_win).astype(np.int64)
+    cumulative = np.cumsum(losses)
+    starts = np.r_[True, users[1:] != users[:-1]] if len(users) else np.zeros(0, dtype=bool)
+
+    # A lose streak ends at every win; its length is the number of losses
+    # since the previous win or the player's first spin.
+    anchors = np.where(is_win | starts, np.arange(len(users)), 0)
+    last_anchor = np.maximum.accumulate(anchors) if len(users) else anchors
+    previous = np.r_[0, last_anchor[:-1]] if len(users) else anchors
+    base = cumulative[previous] - losses[previous]
+    lengths = np.where(starts, 0, cumulative - base)
+    ended = is_win & (lengths > 0)
+
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM rollup_hourly")
+    cursor.execute("DELETE FROM rollup_bets")
+    cursor.execute("DELETE FROM rollup_daily")
+    cursor.execute("DELETE FROM lose_streaks")
+    # Same local-time buckets as record_spin.
+    local = "CAST(strftime('%s', played_at, 'unixepoch', 'localtime') AS INTEGER)"
+    cursor.execute(f"""
+        INSERT INTO rollup_hourly (user_id, hour, bet, spins, wins, wagered, won)
+        SELECT user_id, {local} / 3600 AS hour, bet,
+               COUNT(*), SUM(win > 0), SUM(bet), SUM(win)
+        FROM spin_history GROUP BY user_id, hour, bet
+    """)
+    cursor.execute("""
+        INSERT INTO rollup_bets (user_id, bet, spins, wins, wagered, won)
+        SELECT user_id, bet, COUNT(*), SUM(win > 0), SUM(bet), SUM(win)
+        FROM spin_history GROUP BY user_id, bet
+    """)
+    cursor.execute(f"""
+        INSERT INTO rollup_daily (user_id, day, spins, wins, wagered, won, closing_balance)
+        SELECT g.user_id, g.day, g.spins, g.wins, g.wagered, g.won, h.balance
+        FROM (
+            SELECT user_id, {local} / 86400 AS day,
+                   COUNT(*) AS spins, SUM(win > 0) AS wins,
+                   SUM(bet) AS wagered, SUM(win) AS won, MAX(id) AS last_id
+            FROM spin_history GROUP BY user_id, day
+        ) g JOIN spin_history h ON h.id = g.last_id
+    """)
+    if ended.any():
+        pairs, counts = np.unique(
+            np.stack([users[ended], lengths[ended]], axis=1), axis=0, return_counts=True
+        )
+        cursor.executemany(
+            "INSERT INTO lose_streaks (user_id, length, count) VALUES (?, ?, ?)",
+            [(int(u), int(l), int(c)) for (u, l), c in zip(pairs, counts)]
+        )
+    # Jackpot payouts are not part of spin_history; claim_jackpot books
+    # them separately, so they are added back the same way.
+    cursor.execute("SELECT user_id, played_at, bet, amount FROM jackpot_payouts")
+    for user_id, played_at, bet, amount in cursor.fetchall():
+        bump_rollups(cursor, user_id, played_at, bet, 0, 0, 0, amount)
+    conn.commit()
+
+
 class LoginWindow(QtWidgets.QWidget):
     def __init__(self):
         super().__init__()
@@ -138,47 +946,34 @@ class LoginWindow(QtWidgets.QWidget):
             self.info_label.setText("Enter valid integers for balance and bet")
 
     def login_user(self):
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-
-        cursor.execute(
-            "SELECT id FROM users WHERE username=? AND password=?",
-            (self.username_input.text(), self.password_input.text())
+        conn = connect_db()
+        user_id = find_user(
+            conn, self.username_input.text(), self.password_input.text()
         )
-
-        result = cursor.fetchone()
         conn.close()
 
-        if result:
+        if user_id is not None:
             self.user_authenticated = True
-            self.user_id = result[0]
+            self.user_id = user_id
             self.close()
         else:
             self.info_label.setText("Invalid username or password")
 
     def register_user(self):
+        conn = connect_db()
         try:
-            conn = sqlite3.connect(DB_NAME)
-            cursor = conn.cursor()
-
-            cursor.execute(
-                "INSERT INTO users (username, password) VALUES (?, ?)",
-                (self.username_input.text(), self.password_input.text())
-            )
-
-            user_id = cursor.lastrowid
-            cursor.execute(
-                "INSERT INTO progress (user_id, balance) VALUES (?, ?)",
-                (user_id, self.initial_balance)
+            create_user(
+                conn,
+                self.username_input.text(),
+                self.password_input.text(),
+                self.initial_balance
             )
-
-            conn.commit()
-            conn.close()
-
             self.info_label.setText("Registration successful!")
 
         except sqlite3.IntegrityError:
             self.info_label.setText("Username already exists")
+        finally:
+            conn.close()
 
 def run_login():
     app = QtWidgets.QApplication(sys.argv)
@@ -198,8 +993,169 @@ SYMBOLS = [
     {"emoji": "🔔", "multiplier": 5, "weight": 20},
     {"emoji": "🥝", "multiplier": 10, "weight": 15},
     {"emoji": "🍌", "multiplier": 20, "weight": 10},
+    {"emoji": "💎", "multiplier": 0, "weight": 0},
 ]
 
+# The last symbol only pays the jackpot pool. A stopping reel lands on it
+# with JACKPOT_SYMBOL_CHANCE, so three in a row hit 1 spin in 8000.
+JACKPOT_SYMBOL_IDX = len(SYMBOLS) - 1
+JACKPOT_SYMBOL_CHANCE = 0.05
+
+METRICS_PORT = int(os.environ.get("EARNMASHINE_METRICS_PORT", "0"))
+METRICS_TEXTFILE = os.environ.get("EARNMASHINE_METRICS_FILE")
+METRICS_INTERVAL = 15
+METRICS_RATE_WINDOW = 60
+DB_LATENCY_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
+
+
+def theoretical_rtp(average_bet=None):
+    # A reel shows each regular symbol with probability (1 - q) / n.
+    # Contributions are paid back through the pool, and every jackpot hit
+    # reseeds it with JACKPOT_SEED of house money, relative to the bet.
+    regular = SYMBOLS[:JACKPOT_SYMBOL_IDX]
+    p = (1 - JACKPOT_SYMBOL_CHANCE) / len(regular)
+    rtp = sum(s["multiplier"] for s in regular) * p ** 3 + JACKPOT_CONTRIBUTION
+    if average_bet:
+        rtp += JACKPOT_SEED * JACKPOT_SYMBOL_CHANCE ** 3 / average_bet
+    return rtp
+
+
+class Metrics:
+    # Updated only from the game loop thread; exporters read plain attributes
+    # and tolerate a value being one update behind, so no locks are taken.
+    def __init__(self):
+        self.spins_total = 0
+        self.wins_total = 0
+        self.wagered_total = 0
+        self.payout_total = 0
+        self.level_ups_total = 0
+        self.jackpots_total = 0
+        self.jackpot_paid_total = 0
+        self.spin_times = deque(maxlen=10000)
+        self.db_write_buckets = [0] * (len(DB_LATENCY_BUCKETS) + 1)
+        self.db_write_count = 0
+        self.db_write_sum = 0.0
+        self.music_enabled = 0
+        self.music_playing = 0
+
+    def record_spin(self, bet):
+        self.spins_total += 1
+        self.wagered_total += bet
+        self.spin_times.append(time.monotonic())
+
+    def record_win(self, amount):
+        self.wins_total += 1
+        self.payout_total += amount
+
+    def record_level_up(self):
+        self.level_ups_total += 1
+
+    def record_jackpot(self, amount):
+        self.jackpots_total += 1
+        self.jackpot_paid_total += amount
+        self.payout_total += amount
+
+    def observe_db_write(self, seconds):
+        self.db_write_buckets[bisect.bisect_left(DB_LATENCY_BUCKETS, seconds)] += 1
+        self.db_write_count += 1
+        self.db_write_sum += seconds
+
+    def set_music_state(self, enabled, playing):
+        self.music_enabled = int(enabled)
+        self.music_playing = int(playing)
+
+    def spins_per_second(self):
+        cutoff = time.monotonic() - METRICS_RATE_WINDOW
+        recent = sum(1 for t in list(self.spin_times) if t >= cutoff)
+        return recent / METRICS_RATE_WINDOW
+
+    def render(self):
+        spins = self.spins_total
+        wagered = self.wagered_total
+        payout = self.payout_total
+        rtp = payout / wagered if wagered else 0.0
+        theoretical = theoretical_rtp(wagered / spins if spins else None)
+        lines = []
+
+        def metric(name, kind, help_text, value):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value}")
+
+        metric("earnmashine_spins_total", "counter", "Spins played.", spins)
+        metric("earnmashine_spins_per_second", "gauge",
+               f"Spin rate over the last {METRICS_RATE_WINDOW} seconds.",
+               round(self.spins_per_second(), 4))
+        metric("earnmashine_wins_total", "counter", "Winning spins.", self.wins_total)
+        metric("earnmashine_wagered_total", "counter", "Sum of all bets.", wagered)
+        metric("earnmashine_payout_total", "counter", "Sum of all winnings paid.", payout)
+        metric("earnmashine_average_bet", "gauge", "Average bet per spin.",
+               round(wagered / spins, 4) if spins else 0)
+        metric("earnmashine_rtp", "gauge", "Observed return to player.", round(rtp, 6))
+        metric("earnmashine_rtp_theoretical", "gauge", "Theoretical return to player.",
+               round(theoretical, 6))
+        metric("earnmashine_rtp_drift", "gauge", "Observed minus theoretical RTP.",
+               round(rtp - theoretical, 6) if wagered else 0.0)
+        metric("earnmashine_level_ups_total", "counter", "Level ups.", self.level_ups_total)
+        metric("earnmashine_jackpots_total", "counter", "Jackpots won.", self.jackpots_total)
+        metric("earnmashine_jackpot_paid_total", "counter", "Sum of jackpot payouts.",
+               self.jackpot_paid_total)
+        metric("earnmashine_music_enabled", "gauge", "Music toggle state.", self.music_enabled)
+        metric("earnmashine_music_playing", "gauge", "Music player active.", self.music_playing)
+
+        lines.append("# HELP earnmashine_db_write_seconds Progress save latency.")
+        lines.append("# TYPE earnmashine_db_write_seconds histogram")
+        cumulative = 0
+        for bound, count in zip(DB_LATENCY_BUCKETS + ["+Inf"], list(self.db_write_buckets)):
+            cumulative += count
+            lines.append(f'earnmashine_db_write_seconds_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f"earnmashine_db_write_seconds_sum {round(self.db_write_sum, 6)}")
+        lines.append(f"earnmashine_db_write_seconds_count {self.db_write_count}")
+
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def start_textfile_writer(self, path, interval=METRICS_INTERVAL):
+        def loop():
+            while True:
+                try:
+                    self.write_textfile(path)
+                except OSError:
+                    pass
+                time.sleep(interval)
+
+        threading.Thread(target=loop, daemon=True).start()
+
+    def start_http_server(self, port):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+METRICS = Metrics()
+
 
 class ThemeManager:
     def __init__(self):
@@ -378,9 +1334,10 @@ class MenuButton(Button):
 
 
 class Reel:
-    def __init__(self, x, y):
+    def __init__(self, x, y, on_stop=None):
         self.x = x
         self.y = y
+        self.on_stop = on_stop
         self.current_symbol_idx = 0
         self.is_spinning = False
         self.bg_color = arcade.color.DARK_GRAY
@@ -392,9 +1349,13 @@ class Reel:
 
     def update(self):
         if self.is_spinning:
-            self.current_symbol_idx = random.randint(0, len(SYMBOLS) - 1)
+            self.current_symbol_idx = random.randint(0, JACKPOT_SYMBOL_IDX - 1)
             if time.time() >= self.stop_time:
                 self.is_spinning = False
+                if random.random() < JACKPOT_SYMBOL_CHANCE:
+                    self.current_symbol_idx = JACKPOT_SYMBOL_IDX
+                if self.on_stop:
+                    self.on_stop()
 
     def draw(self):
         arcade.draw_lbwh_rectangle_filled(
@@ -403,20 +1364,54 @@ class Reel:
         arcade.draw_lbwh_rectangle_outline(
             self.x - 45, self.y - 70, 90, 140, self.border_color, 3
         )
+        emoji = SYMBOLS[self.current_symbol_idx]["emoji"]
+        texture = SYMBOL_TEXTURES.get(emoji)
+        if texture:
+            arcade.draw_texture_rect(
+                texture, arcade.XYWH(self.x, self.y, texture.width, texture.height)
+            )
+            return
         arcade.draw_text(
-            SYMBOLS[self.current_symbol_idx]["emoji"],
+            emoji,
             self.x, self.y,
             arcade.color.WHITE, 48,
             anchor_x="center", anchor_y="center"
         )
 
 
+def format_account_stats(stats):
+    if not stats["spins"]:
+        return "No spins recorded yet."
+
+    hours = len(stats["spins_per_hour"])
+    lines = [
+        f"Spins: {stats['spins']}  Win rate: {100 * stats['wins'] / stats['spins']:.1f}%",
+        f"Spins/hour (last {hours}h): {stats['spins_per_hour'].sum() / hours:.1f}"
+        f"  peak {stats['spins_per_hour'].max()}",
+        "Win rate by bet: " + ", ".join(
+            f"${bet} {100 * rate:.0f}%" for bet, rate in zip(stats["bets"], stats["win_rate"])
+        ),
+    ]
+    if len(stats["streak_lengths"]):
+        longest = stats["streak_lengths"].max()
+        common = stats["streak_lengths"][stats["streak_counts"].argmax()]
+        lines.append(f"Lose streaks: longest {longest}, most common {common}")
+    if len(stats["net_cumulative"]):
+        total = int(stats["net_cumulative"][-1])
+        latest = int(stats["net_by_day"][-1])
+        lines.append(
+            f"Net over {len(stats['days'])} days: {'-' if total < 0 else '+'}${abs(total)}"
+            f"  last day {'-' if latest < 0 else '+'}${abs(latest)}"
+        )
+    return "\n".join(lines)
+
+
 class AccountWindow(QtWidgets.QWidget):
     def __init__(self, user_id):
         super().__init__()
         self.user_id = user_id
         self.setWindowTitle("Account Settings")
-        self.setGeometry(600, 350, 400, 350)
+        self.setGeometry(600, 350, 400, 520)
         self.selected_avatar = "🐱"
         self.init_ui()
         self.load_user_data()
@@ -443,6 +1438,10 @@ class AccountWindow(QtWidgets.QWidget):
             self.avatar_buttons[av] = btn
         layout.addLayout(avatar_layout)
 
+        self.stats_label = QtWidgets.QLabel("")
+        self.stats_label.setWordWrap(True)
+        layout.addWidget(self.stats_label)
+
         self.save_button = QtWidgets.QPushButton("Save Changes")
         self.save_button.clicked.connect(self.save_changes)
         layout.addWidget(self.save_button)
@@ -453,11 +1452,13 @@ class AccountWindow(QtWidgets.QWidget):
         self.setLayout(layout)
 
     def load_user_data(self):
-        conn = sqlite3.connect(DB_NAME)
+        conn = connect_db()
         cursor = conn.cursor()
         cursor.execute("SELECT username, password, avatar FROM users WHERE id=?", (self.user_id,))
         result = cursor.fetchone()
+        stats = compute_analytics(conn, self.user_id)
         conn.close()
+        self.stats_label.setText(format_account_stats(stats))
         if result:
             username, password, avatar = result
             self.username_label.setText(f"Username: {username}")
@@ -469,7 +1470,7 @@ class AccountWindow(QtWidgets.QWidget):
         self.status_label.setText(f"Selected avatar: {avatar}")
 
     def save_changes(self):
-        conn = sqlite3.connect(DB_NAME)
+        conn = connect_db()
         cursor = conn.cursor()
         cursor.execute("UPDATE users SET avatar=? WHERE id=?", (self.selected_avatar, self.user_id))
         conn.commit()
@@ -477,12 +1478,16 @@ class AccountWindow(QtWidgets.QWidget):
         self.status_label.setText(f"Avatar saved: {self.selected_avatar}")
 
 class MainMenu(arcade.Window):
-    def __init__(self):
+    def __init__(self, sound_effects=None, assets=None):
         super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, "EarnMashine — Menu")
         arcade.set_background_color(arcade.color.DARK_BLUE_GRAY)
 
-        self.music_manager = MusicManager("music/music.mp3")
+        self.assets = assets or start_asset_pipeline()
+        self.sound_effects = sound_effects or SoundEffects(self.assets)
+
+        self.music_manager = MusicManager()
         self.music_manager.play()
+        self.assets.when_ready("music", self.music_manager.set_music)
 
         self.start_button = MenuButton(
             SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 60,
@@ -529,23 +1534,47 @@ class MainMenu(arcade.Window):
         for button in self.buttons:
             button.draw()
 
+        if self.assets.loading():
+            progress = self.assets.done / self.assets.total
+            arcade.draw_lbwh_rectangle_outline(
+                SCREEN_WIDTH // 2 - 150, 60, 300, 16, arcade.color.LIGHT_GRAY, 2
+            )
+            arcade.draw_lbwh_rectangle_filled(
+                SCREEN_WIDTH // 2 - 150, 60, 300 * progress, 16, arcade.color.GOLD
+            )
+            arcade.draw_text(
+                f"Loading assets... {self.assets.done}/{self.assets.total}",
+                SCREEN_WIDTH // 2,
+                90,
+                arcade.color.LIGHT_GRAY,
+                14,
+                anchor_x="center"
+            )
+
+    def on_update(self, delta_time):
+        self.assets.poll()
+
     def on_mouse_motion(self, x, y, dx, dy):
         for button in self.buttons:
             button.update_hover(x, y)
 
     def on_mouse_press(self, x, y, button, modifiers):
         if self.start_button.check_click(x, y):
+            self.sound_effects.play("click")
             self.music_manager.stop()
             self.close()
 
             game = EarnMashine(
                 GLOBAL_USER_ID,
                 GLOBAL_BALANCE,
-                GLOBAL_BET
+                GLOBAL_BET,
+                self.sound_effects,
+                self.assets
             )
             arcade.run()
 
         elif self.music_button.check_click(x, y):
+            self.sound_effects.play("click")
             self.music_manager.toggle()
             self.music_button.text = (
                 "🔊 MUSIC: ON" if self.music_manager.enabled else "🔇 MUSIC: OFF"
@@ -556,20 +1585,34 @@ class MainMenu(arcade.Window):
             arcade.exit()
 
 class EarnMashine(arcade.Window):
-    def __init__(self, user_id, initial_balance=1000, initial_bet=10):
+    def __init__(self, user_id, initial_balance=1000, initial_bet=10,
+                 sound_effects=None, assets=None):
         super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
         self.user_id = user_id
+        self.assets = assets or start_asset_pipeline()
+        self.sound_effects = sound_effects or SoundEffects(self.assets)
         self.theme_manager = ThemeManager()
         self.initial_balance = initial_balance
         self.initial_bet = initial_bet
 
         self.current_avatar = "🐱"
+        self.spin_id = None
+        self.spin_bet = 0
+        self.last_spin = None
+        self.pending_jackpot_spins = []
+        self.jackpot_claims_open = False
+        self.jackpot_pending = 0.0
+        self.jackpot_amount = 0
 
 
         self.load_progress()
 
 
-        self.reels = [Reel(350, 350), Reel(450, 350), Reel(550, 350)]
+        self.reels = [
+            Reel(350, 350, self.on_reel_stop),
+            Reel(450, 350, self.on_reel_stop),
+            Reel(550, 350, self.on_reel_stop)
+        ]
         self.spin_button = Button(450, 100, 160, 50, "SPIN")
         self.theme_button = Button(820, 560, 120, 35, "THEME")
         self.account_button = Button(820, 510, 120, 35, "ACCOUNT")
@@ -594,16 +1637,12 @@ class EarnMashine(arcade.Window):
 
 
     def load_progress(self):
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT balance, level, xp,
-                   total_spins, total_wins,
-                   total_win_amount, lose_streak,
-                   (SELECT avatar FROM users WHERE id=?)
-            FROM progress WHERE user_id=?
-        """, (self.user_id, self.user_id))
-        result = cursor.fetchone()
+        conn = connect_db()
+        paid, settled, result, self.jackpot_amount = load_player(conn, self.user_id)
+        conn.close()
+        self.jackpot_claims_open = not settled
+        for amount in paid:
+            METRICS.record_jackpot(amount)
         if result:
             (
                 self.balance,
@@ -625,32 +1664,40 @@ class EarnMashine(arcade.Window):
             self.total_win_amount = 0
             self.lose_streak = 0
             self.current_avatar = "🐱"
-        conn.close()
         self.bet = self.initial_bet
         self.xp_to_next = 100
 
     def save_progress(self):
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE progress SET
-            balance=?, level=?, xp=?,
-            total_spins=?, total_wins=?,
-            total_win_amount=?, lose_streak=?
-            WHERE user_id=?
-        """, (
-            self.balance,
-            self.level,
-            self.xp,
-            self.total_spins,
-            self.total_wins,
-            self.total_win_amount,
-            self.lose_streak,
-            self.user_id
-        ))
-        conn.commit()
+        start = time.perf_counter()
+        conn = connect_db()
+        contribution = int(self.jackpot_pending)
+        paid, settled, self.jackpot_amount = save_spin(
+            conn,
+            self.user_id,
+            (
+                self.balance,
+                self.level,
+                self.xp,
+                self.total_spins,
+                self.total_wins,
+                self.total_win_amount,
+                self.lose_streak
+            ),
+            contribution,
+            self.last_spin,
+            self.pending_jackpot_spins,
+            self.jackpot_claims_open
+        )
         conn.close()
-
+        self.pending_jackpot_spins = []
+        self.jackpot_claims_open = not settled
+        for amount in paid:
+            self.balance += amount
+            self.total_win_amount += amount
+            METRICS.record_jackpot(amount)
+        self.jackpot_pending -= contribution
+        self.last_spin = None
+        METRICS.observe_db_write(time.perf_counter() - start)
 
     def add_xp(self, amount):
         self.xp += amount
@@ -662,6 +1709,7 @@ class EarnMashine(arcade.Window):
         self.level += 1
         self.xp_to_next = int(self.xp_to_next * 1.5)
         self.balance += 50
+        METRICS.record_level_up()
 
 
     def increase_bet(self):
@@ -695,6 +1743,9 @@ class EarnMashine(arcade.Window):
                          20, SCREEN_HEIGHT - 90, self.theme_manager.get("text"), 14)
         arcade.draw_text(f"BET: ${self.bet}", SCREEN_WIDTH // 2, 160,
                          self.theme_manager.get("text"), 18, anchor_x="center")
+        arcade.draw_text(f"JACKPOT: ${self.jackpot_amount + int(self.jackpot_pending)}",
+                         SCREEN_WIDTH // 2, SCREEN_HEIGHT - 60,
+                         arcade.color.GOLD, 22, anchor_x="center")
 
 
         arcade.draw_text(
@@ -712,6 +1763,7 @@ class EarnMashine(arcade.Window):
 
 
     def on_update(self, delta_time):
+        self.assets.poll()
         for reel in self.reels:
             reel.update()
         self.win_effect.update()
@@ -720,43 +1772,77 @@ class EarnMashine(arcade.Window):
             self.check_win()
             self.save_progress()
 
+    def on_reel_stop(self):
+        self.sound_effects.play("reel_stop")
 
     def spin_all_reels(self):
         if self.balance < self.bet:
             return
         self.balance -= self.bet
         self.total_spins += 1
+        METRICS.record_spin(self.bet)
+        self.spin_id = uuid.uuid4().hex
+        self.spin_bet = self.bet
+        self.jackpot_pending += self.bet * JACKPOT_CONTRIBUTION
         self.add_xp(10)
+        self.sound_effects.play("spin")
         for reel in self.reels:
             reel.start_spin()
         self.is_game_spinning = True
 
     def check_win(self):
         ids = [r.current_symbol_idx for r in self.reels]
-        if ids[0] == ids[1] == ids[2]:
+        played_at = time.time()
+        if ids[0] == ids[1] == ids[2] == JACKPOT_SYMBOL_IDX:
+            # The spin itself wins nothing and counts towards the lose
+            # streak like in spin_history; the pool is paid by claim_jackpot,
+            # which books the payout into the rollups on its own.
+            self.pending_jackpot_spins.append((self.spin_id, self.spin_bet, played_at))
+            self.lose_streak += 1
+            self.last_spin = {
+                "bet": self.spin_bet, "win": 0, "ended_streak": 0, "played_at": played_at
+            }
+            self.sound_effects.play("jackpot")
+            self.add_xp(25)
+            self.win_effect.start(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
+        elif ids[0] == ids[1] == ids[2]:
             win = self.bet * SYMBOLS[ids[0]]["multiplier"]
             self.balance += win
             self.total_wins += 1
             self.total_win_amount += win
+            self.last_spin = {
+                "bet": self.spin_bet, "win": win, "ended_streak": self.lose_streak,
+                "played_at": played_at
+            }
             self.lose_streak = 0
+            METRICS.record_win(win)
+            self.sound_effects.play("win")
             self.add_xp(25)
             self.win_effect.start(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
         else:
             self.lose_streak += 1
+            self.last_spin = {
+                "bet": self.spin_bet, "win": 0, "ended_streak": 0, "played_at": played_at
+            }
             self.add_xp(5)
 
 
     def on_mouse_press(self, x, y, button, modifiers):
         if self.spin_button.check_click(x, y) and not self.is_game_spinning:
+            self.sound_effects.play("click")
             self.spin_all_reels()
         if self.theme_button.check_click(x, y):
+            self.sound_effects.play("click")
             self.theme_manager.toggle_theme()
             self.apply_theme()
         if self.account_button.check_click(x, y):
+            self.sound_effects.play("click")
             self.open_account_window()
         if self.bet_plus_button.check_click(x, y):
+            self.sound_effects.play("click")
             self.increase_bet()
         if self.bet_minus_button.check_click(x, y):
+            self.sound_effects.play("click")
             self.decrease_bet()
 
 
@@ -776,6 +1862,15 @@ class EarnMashine(arcade.Window):
 if __name__ == "__main__":
     init_db()
 
+    if METRICS_PORT:
+        METRICS.start_http_server(METRICS_PORT)
+    if METRICS_TEXTFILE:
+        METRICS.start_textfile_writer(METRICS_TEXTFILE)
+
+    # Start decoding while the login window is up.
+    assets = start_asset_pipeline()
+    sound_effects = SoundEffects(assets)
+
     authenticated, user_id, balance, bet = run_login()
     if not authenticated:
         sys.exit()
@@ -784,6 +1879,6 @@ if __name__ == "__main__":
     GLOBAL_BALANCE = balance
     GLOBAL_BET = bet
 
-    menu = MainMenu()
+    menu = MainMenu(sound_effects, assets)
     arcade.run()
 
@@ -0,0 +1,353 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+import main
+
+
+OPERATIONS = ["register", "login", "load", "save"]
+DEFAULT_MIX = "register=1,login=5,load=10,save=40"
+# Only modes stored in the database file itself; per-connection modes would
+# need a PRAGMA on every connection, which the game never issues.
+JOURNAL_MODES = ["delete", "wal"]
+START_DELAY = 0.2
+BETS = [5, 10, 15, 20, 50]
+
+start_barrier = None
+
+
+def parse_mix(text):
+    weights = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation: {name}")
+        weights[name] = float(weight)
+    return weights
+
+
+def parse_list(text):
+    return [item.strip() for item in text.split(",") if item.strip()]
+
+
+def configure_db(db_path, timeout):
+    main.DB_NAME = db_path
+    main.DB_TIMEOUT = timeout
+
+
+def set_journal_mode(journal_mode):
+    conn = main.connect_db()
+    conn.execute(f"PRAGMA journal_mode={journal_mode}")
+    conn.close()
+
+
+def init_worker(barrier):
+    global start_barrier
+    start_barrier = barrier
+
+
+def roll_reels():
+    # Same odds as Reel: each reel stops on the jackpot symbol with
+    # JACKPOT_SYMBOL_CHANCE, otherwise on a uniformly picked regular symbol.
+    return [
+        main.JACKPOT_SYMBOL_IDX if random.random() < main.JACKPOT_SYMBOL_CHANCE
+        else random.randrange(main.JACKPOT_SYMBOL_IDX)
+        for _ in range(3)
+    ]
+
+
+def reset_db(db_path):
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+
+class ThreadStats:
+    def __init__(self):
+        self.latencies = {op: [] for op in OPERATIONS}
+        self.locked = {op: 0 for op in OPERATIONS}
+        self.failed = {op: 0 for op in OPERATIONS}
+
+    def merge(self, other):
+        for op in OPERATIONS:
+            self.latencies[op].extend(other.latencies[op])
+            self.locked[op] += other.locked[op]
+            self.failed[op] += other.failed[op]
+
+
+class Player:
+    def __init__(self, name, pool, stats):
+        self.name = name
+        self.pool = pool
+        self.stats = stats
+        self.conn = None
+        self.users = []
+        self.counter = itertools.count()
+        self.lose_streaks = defaultdict(int)
+        self.jackpot_pending = 0.0
+
+    def connection(self):
+        if self.pool == "per-op":
+            return main.connect_db()
+        if self.conn is None:
+            self.conn = main.connect_db()
+        return self.conn
+
+    def release(self, conn):
+        if self.pool == "per-op":
+            conn.close()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def run_op(self, op):
+        start = time.perf_counter()
+        conn = None
+        try:
+            conn = self.connection()
+            getattr(self, "op_" + op)(conn)
+        except sqlite3.OperationalError as e:
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
+            if "locked" in str(e) or "busy" in str(e):
+                self.stats.locked[op] += 1
+            else:
+                self.stats.failed[op] += 1
+            return
+        except sqlite3.Error:
+            self.stats.failed[op] += 1
+            return
+        finally:
+            if conn is not None:
+                self.release(conn)
+        self.stats.latencies[op].append(time.perf_counter() - start)
+
+    def op_register(self, conn):
+        username = f"{self.name}_{next(self.counter)}"
+        password = "pw_" + username
+        user_id = main.create_user(conn, username, password, 1000)
+        self.users.append((user_id, username, password))
+
+    def op_login(self, conn):
+        _, username, password = random.choice(self.users)
+        main.find_user(conn, username, password)
+
+    def op_load(self, conn):
+        user_id, _, _ = random.choice(self.users)
+        main.load_player(conn, user_id)
+
+    def op_save(self, conn):
+        # Goes through main.save_spin like EarnMashine.save_progress, so a
+        # save carries the pool contribution, the spin history row and
+        # rollups and, on a jackpot, the claim commit and claim transaction.
+        user_id, _, _ = random.choice(self.users)
+        bet = random.choice(BETS)
+        played_at = time.time()
+        ids = roll_reels()
+        spin = {"bet": bet, "win": 0, "ended_streak": 0, "played_at": played_at}
+        claims = []
+        if ids[0] == ids[1] == ids[2] == main.JACKPOT_SYMBOL_IDX:
+            claims.append((uuid.uuid4().hex, bet, played_at))
+            self.lose_streaks[user_id] += 1
+        elif ids[0] == ids[1] == ids[2]:
+            spin["win"] = bet * main.SYMBOLS[ids[0]]["multiplier"]
+            spin["ended_streak"] = self.lose_streaks.pop(user_id, 0)
+        else:
+            self.lose_streaks[user_id] += 1
+        self.jackpot_pending += bet * main.JACKPOT_CONTRIBUTION
+        contribution = int(self.jackpot_pending)
+        main.save_spin(
+            conn,
+            user_id,
+            (
+                random.randint(0, 5000),
+                random.randint(1, 50),
+                random.randint(0, 500),
+                random.randint(0, 10000),
+                random.randint(0, 3000),
+                random.randint(0, 100000),
+                self.lose_streaks[user_id]
+            ),
+            contribution,
+            spin,
+            claims
+        )
+        self.jackpot_pending -= contribution
+
+
+def run_thread(name, config, stats, start_at):
+    player = Player(name, config["pool"], stats)
+    ops = list(config["mix"])
+    weights = [config["mix"][op] for op in ops]
+
+    while time.time() < start_at:
+        time.sleep(0.001)
+
+    deadline = start_at + config["duration"]
+    while time.time() < deadline:
+        if not player.users:
+            player.run_op("register")
+        else:
+            player.run_op(random.choices(ops, weights)[0])
+    player.close()
+
+
+def run_process(config, process_index):
+    configure_db(config["db"], config["timeout"])
+    # Every process has finished importing by the time the barrier opens,
+    # so all of them share one start time and one deadline.
+    if start_barrier is not None:
+        start_barrier.wait()
+    start_at = time.time() + START_DELAY
+    threads = []
+    thread_stats = []
+    for thread_index in range(config["threads"]):
+        stats = ThreadStats()
+        name = f"load_{os.getpid()}_{process_index}_{thread_index}"
+        thread = threading.Thread(
+            target=run_thread, args=(name, config, stats, start_at)
+        )
+        threads.append(thread)
+        thread_stats.append(stats)
+        thread.start()
+
+    total = ThreadStats()
+    for thread, stats in zip(threads, thread_stats):
+        thread.join()
+        total.merge(stats)
+    return total
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def run_scenario(config):
+    reset_db(config["db"])
+    configure_db(config["db"], config["timeout"])
+    main.init_db()
+    set_journal_mode(config["journal_mode"])
+
+    if config["processes"] > 1:
+        barrier = multiprocessing.Barrier(config["processes"])
+        with multiprocessing.Pool(
+            config["processes"], initializer=init_worker, initargs=(barrier,)
+        ) as pool:
+            results = pool.starmap(
+                run_process,
+                [(config, i) for i in range(config["processes"])],
+                chunksize=1
+            )
+    else:
+        results = [run_process(config, 0)]
+
+    total = ThreadStats()
+    for stats in results:
+        total.merge(stats)
+    return total
+
+
+def report(config, stats):
+    players = config["processes"] * config["threads"]
+    print(
+        f"\n== journal={config['journal_mode']} timeout={config['timeout']}s "
+        f"pool={config['pool']} players={players} "
+        f"({config['processes']}x{config['threads']}) "
+        f"duration={config['duration']}s =="
+    )
+    print(
+        f"{'op':<10}{'ok':>9}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'p99 ms':>10}{'max ms':>10}{'locked':>9}{'lock %':>9}{'other':>7}"
+    )
+
+    total_ok = 0
+    total_locked = 0
+    for op in OPERATIONS:
+        latencies = sorted(stats.latencies[op])
+        ok = len(latencies)
+        locked = stats.locked[op]
+        failed = stats.failed[op]
+        attempts = ok + locked + failed
+        if attempts == 0:
+            continue
+        total_ok += ok
+        total_locked += locked
+        print(
+            f"{op:<10}{ok:>9}{ok / config['duration']:>10.1f}"
+            f"{percentile(latencies, 0.50) * 1000:>10.2f}"
+            f"{percentile(latencies, 0.95) * 1000:>10.2f}"
+            f"{percentile(latencies, 0.99) * 1000:>10.2f}"
+            f"{(latencies[-1] if latencies else 0.0) * 1000:>10.2f}"
+            f"{locked:>9}{100.0 * locked / attempts:>8.2f}%{failed:>7}"
+        )
+
+    attempts = total_ok + total_locked
+    print(
+        f"total: {total_ok / config['duration']:.1f} ops/s, "
+        f"locked {100.0 * total_locked / attempts if attempts else 0.0:.2f}%"
+    )
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(
+        description="Stress the EarnMashine SQLite paths with concurrent players."
+    )
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "earnmashine_stress.db"),
+                        help="database file to create (wiped before every scenario)")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8,
+                        help="player threads per process")
+    parser.add_argument("--duration", type=float, default=10.0,
+                        help="seconds per scenario")
+    parser.add_argument("--journal-modes", type=parse_list, default=JOURNAL_MODES,
+                        help="comma separated: " + ", ".join(JOURNAL_MODES))
+    parser.add_argument("--timeouts", type=parse_list, default=["5.0"],
+                        help="comma separated busy timeouts in seconds")
+    parser.add_argument("--pools", type=parse_list, default=["per-op", "per-thread"],
+                        help="per-op opens a connection per call like the game does, "
+                             "per-thread keeps one connection per player")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"operation weights (default: {DEFAULT_MIX})")
+    args = parser.parse_args()
+
+    for pool in args.pools:
+        if pool not in ("per-op", "per-thread"):
+            parser.error(f"Unknown pool setting: {pool}")
+    for journal_mode in args.journal_modes:
+        if journal_mode not in JOURNAL_MODES:
+            parser.error(f"Unknown journal mode: {journal_mode}")
+
+    for journal_mode, timeout, pool in itertools.product(
+        args.journal_modes, args.timeouts, args.pools
+    ):
+        config = {
+            "db": args.db,
+            "processes": args.processes,
+            "threads": args.threads,
+            "duration": args.duration,
+            "journal_mode": journal_mode,
+            "timeout": float(timeout),
+            "pool": pool,
+            "mix": args.mix,
+        }
+        report(config, run_scenario(config))
+
+    reset_db(args.db)
+
+
+if __name__ == "__main__":
+    main_cli()
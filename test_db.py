@@ -0,0 +1,98 @@
+import random
+
+import pytest
+
+import main
+
+
+ROLLUP_TABLES = ["rollup_hourly", "rollup_bets", "rollup_daily", "lose_streaks"]
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DB_NAME", str(tmp_path / "users.db"))
+    main.init_db()
+    conn = main.connect_db()
+    yield conn
+    conn.close()
+
+
+def snapshot(conn):
+    return {
+        table: sorted(conn.execute(f"SELECT * FROM {table}").fetchall())
+        for table in ROLLUP_TABLES
+    }
+
+
+def play(conn, user_id, spins, start, rng):
+    # Saves spins the way EarnMashine does, with jackpot claims settled
+    # either in the same save or only by a later load.
+    balance = 1000
+    lose_streak = 0
+    claims = []
+    for i in range(spins):
+        played_at = start + i * 97
+        bet = rng.choice([5, 10, 20])
+        spin = {"bet": bet, "win": 0, "ended_streak": 0, "played_at": played_at}
+        roll = rng.random()
+        if roll < 0.02:
+            claims.append((f"{user_id}-{i}", bet, played_at))
+            lose_streak += 1
+        elif roll < 0.25:
+            spin["win"] = bet * 3
+            spin["ended_streak"] = lose_streak
+            lose_streak = 0
+        else:
+            lose_streak += 1
+        balance += spin["win"] - bet
+        settle_now = claims and rng.random() < 0.5
+        paid, _, _ = main.save_spin(
+            conn,
+            user_id,
+            (balance, 1, 0, i + 1, 0, 0, lose_streak),
+            1,
+            spin,
+            claims if settle_now else ()
+        )
+        balance += sum(paid)
+        if settle_now:
+            claims = []
+    if claims:
+        main.add_jackpot_claims(conn, user_id, claims)
+        main.load_player(conn, user_id)
+
+
+def test_incremental_rollups_match_rebuild(conn):
+    rng = random.Random(7)
+    start = 1700000000
+    for name in ("alice", "bob"):
+        user_id = main.create_user(conn, name, "pw", 1000)
+        play(conn, user_id, 1500, start, rng)
+
+    assert conn.execute("SELECT COUNT(*) FROM jackpot_payouts").fetchone()[0] > 0
+    assert conn.execute("SELECT COUNT(*) FROM jackpot_claims").fetchone()[0] == 0
+    incremental = snapshot(conn)
+    main.rebuild_rollups(conn)
+    assert snapshot(conn) == incremental
+
+
+def test_jackpot_claim_pays_once(conn):
+    user_id = main.create_user(conn, "alice", "pw", 1000)
+    claim = ("spin-1", 10, 1700000000.0)
+    main.add_jackpot_claims(conn, user_id, [claim])
+
+    assert main.claim_jackpot(conn, "spin-1", user_id) == main.JACKPOT_SEED
+    assert main.claim_jackpot(conn, "spin-1", user_id) == 0
+
+    # A claim recorded again for the same spin is cleaned up without paying.
+    main.add_jackpot_claims(conn, user_id, [claim])
+    assert main.settle_jackpot_claims(conn, user_id) == ([], True)
+    assert conn.execute("SELECT COUNT(*) FROM jackpot_claims").fetchone()[0] == 0
+
+    balance, won = conn.execute(
+        "SELECT balance, total_win_amount FROM progress WHERE user_id=?", (user_id,)
+    ).fetchone()
+    assert (balance, won) == (1000 + main.JACKPOT_SEED, main.JACKPOT_SEED)
+    assert conn.execute(
+        "SELECT SUM(won) FROM rollup_bets WHERE user_id=?", (user_id,)
+    ).fetchone()[0] == main.JACKPOT_SEED